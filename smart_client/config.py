@@ -22,19 +22,19 @@ def load_configuration() -> None:
     if not CONFIG_FILE.is_file():
         raise FileNotFoundError("Konfigurationsfilen blev ikke fundet.")
 
-    with open(CONFIG_FILE) as c:
-        try:
-            config: dict = json.load(c)
-        except ValueError as e:
-            raise ValueError(f"FEJL. Konfigurationsfilen kan ikke parses korrekt: {e}")
-
-        for key in REQUIRED_CONFIG_KEYS:
-            if key not in config:
-                raise ValueError(
-                    f"FEJL. Mangler følgende påkrævede konfigurationsnøgle: {key}"
-                )
-            os.environ[key.upper()] = config[key]
-
-            # for k, v in config.items():
-            #     if k.lower() in REQUIRED_CONFIG_KEYS:
-            #         os.environ[k.upper()] = str(v)
+    # json detects the utf-encoding of bytes itself, regardless of the locale
+    try:
+        config: dict = json.loads(CONFIG_FILE.read_bytes())
+    except ValueError as e:
+        raise ValueError(f"FEJL. Konfigurationsfilen kan ikke parses korrekt: {e}")
+
+    for key in REQUIRED_CONFIG_KEYS:
+        if key not in config:
+            raise ValueError(
+                f"FEJL. Mangler følgende påkrævede konfigurationsnøgle: {key}"
+            )
+        os.environ[key.upper()] = config[key]
+
+        # for k, v in config.items():
+        #     if k.lower() in REQUIRED_CONFIG_KEYS:
+        #         os.environ[k.upper()] = str(v)
@@ -1,28 +1,36 @@
 from http.client import HTTPException
 import os
+import base64
+import contextlib
 import csv
+import functools
 import sys
 import locale
 import hashlib
 import json
+import re
+import threading
 
 # from datetime import date
 from pathlib import Path
-from typing import Any, Optional, List, Dict
-from xml.dom.minidom import parseString
+from typing import TYPE_CHECKING, Any, Optional, List, Dict, Tuple
+import xml.etree.ElementTree as ET
 
 # from datetime import datetime
 import urllib.parse
 import uuid
+from concurrent.futures import ThreadPoolExecutor
 
-import httpx
-import dicttoxml
 from gooey import Gooey, GooeyParser
 
 import smart_client.config as config
 
+if TYPE_CHECKING:
+    # imported in main(), as the gui-process never uses it
+    import httpx
 
-ADDITIONAL_FIELDS: list = ["navn", "email", "telefon"]
+
+ADDITIONAL_FIELDS: frozenset = frozenset(["navn", "email", "telefon"])
 ARKIBAS_JOURNAL_COLS: list = [
     "JournalAar",
     "JournalNr",
@@ -50,29 +58,35 @@ ARKIBAS_CONTENT_COLS: list = [
     "Note",
     "Filnavn",
 ]
+# the last path-segment of a url, ignoring trailing slashes
+FILENAME_RE = re.compile(r"/([^/?#]+)/*(?:[?#]|$)")
+# metadata formats and their position in the gui's format chooser
+FORMATS: Dict[str, int] = {"json": 0, "xml": 1, "arkibas": 2}
+# checksum algoritms and their position in the gui's checksum chooser
+HASHES: Dict[str, int] = {"md5": 0, "sha256": 1, "blake2b": 2}
+# file-metadata from the api, and the "missing"-mark set by download_file(), that
+# are left out of the saved submission
+IGNORE_KEYS: tuple = ("url", "id", "missing")
+# bytes per read/write when hashing, downloading and writing files
+CHUNK_SIZE: int = 1 << 20
+# O_BINARY keeps windows from translating newlines in downloaded files
+WRITE_FLAGS: int = os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, "O_BINARY", 0)
+# number of files downloaded concurrently
+MAX_DOWNLOADS: int = 4
+PRINT_LOCK = threading.Lock()
+
+
+def log(message: str) -> None:
+    """Thread-safe print, so output from concurrent downloads isn't interleaved"""
+    with PRINT_LOCK:
+        print(message, flush=True)
 
 
 def generate_arkibas_csvs(dir_path: Path, submission: Dict) -> None:
     journal_path: Path = dir_path / "journal.csv"
     content_path: Path = dir_path / "indhold.csv"
 
-    # if any(x.exists() for x in [journal_path, content_path]):
-    #     print(
-    #         "ADVARSEL. En metadatafil fra samme uuid"
-    #         " ligger allerede i mappen. Overskriver ikke.",
-    #         flush=True,
-    #     )
-    #     return
-
-    if journal_path.exists():
-        print(
-            "ADVARSEL. En metadatafil fra samme uuid"
-            " ligger allerede i mappen. Overskriver ikke.",
-            flush=True,
-        )
-        return
-
-    if content_path.exists():
+    if journal_path.exists() or content_path.exists():
         print(
             "ADVARSEL. En metadatafil fra samme uuid"
             " ligger allerede i mappen. Overskriver ikke.",
@@ -80,48 +94,43 @@ def generate_arkibas_csvs(dir_path: Path, submission: Dict) -> None:
         )
         return
 
+    journal_row: Dict = {
+        # "ModtagetDato": datetime.fromtimestamp(
+        #     int(submission.get("completed", "1234567890"))
+        # )
+        # or None,
+        # "Bemærkning": f"SmartarkiveringsID: {submission.get('uuid')}",
+        "Giver1Navn": submission.get("navn"),
+        "Giver1Telefon": submission.get("telefon"),
+        "Giver1Email": submission.get("email"),
+    }
     with open(journal_path, "w", encoding="utf-8", newline="") as j:
-        journal = csv.DictWriter(j, fieldnames=ARKIBAS_JOURNAL_COLS)
-        journal.writeheader()
-        journal.writerow(
-            {
-                # "ModtagetDato": datetime.fromtimestamp(
-                #     int(submission.get("completed", "1234567890"))
-                # )
-                # or None,
-                # "Bemærkning": f"SmartarkiveringsID: {submission.get('uuid')}",
-                "Giver1Navn": submission.get("navn"),
-                "Giver1Telefon": submission.get("telefon"),
-                "Giver1Email": submission.get("email"),
-            }
+        journal = csv.writer(j)
+        journal.writerow(ARKIBAS_JOURNAL_COLS)
+        journal.writerow([journal_row.get(col) for col in ARKIBAS_JOURNAL_COLS])
+
+    files: List[Dict] = submission.get("files", [])
+    description = submission.get("description")
+    location = submission.get("location")
+    count = len(files)
+    # one row per file, so buffer more than the default 8 KB between writes
+    with open(
+        content_path, "w", encoding="utf-8", newline="", buffering=CHUNK_SIZE
+    ) as i:
+        content = csv.writer(i)
+        content.writerow(ARKIBAS_CONTENT_COLS)
+        # columns in the order of ARKIBAS_CONTENT_COLS
+        content.writerows(
+            (None, description, None, count, location, None, file.get("filename"))
+            for file in files
         )
 
-    with open(content_path, "w", encoding="utf-8", newline="") as i:
-        journal = csv.DictWriter(i, fieldnames=ARKIBAS_CONTENT_COLS)
-        journal.writeheader()
-        for file in submission.get("files", []):
-            journal.writerow(
-                {
-                    "Indhold": submission.get("description"),
-                    "Mængde": len(submission["files"]),
-                    "Placering": submission.get("location"),
-                    "Filnavn": file.get("filename"),
-                }
-            )
-
 
 def default_value(field: str, value: Optional[str]) -> int:
     if field == "format":
-        if value:
-            if value == "json":
-                return 0
-            elif value == "xml":
-                return 1
-            elif value == "arkibas":
-                return 2
-            else:
-                return 0
-        return 0
+        return FORMATS.get(value or "", 0)
+    elif field == "hash":
+        return HASHES.get(value or "", 1)
     return 0
 
 
@@ -139,7 +148,8 @@ def setup_parser(cli: GooeyParser) -> Any:
             "Sti til rodmappen, hvor afleveringen skal gemmes.\n\n"
             "Hver aflevering, inkl. filer, bliver placeret i en undermappe til rodmappen,"
             " navngivet efter afleveringens UUID. Allerede eksisterende filer og/eller "
-            "afleveringsformular bliver ikke overskrevet.\n"
+            "afleveringsformular bliver ikke overskrevet, med mindre en fil er "
+            "ufuldstændig.\n"
         ),
         widget="DirChooser",
         type=Path,
@@ -186,7 +196,7 @@ def setup_parser(cli: GooeyParser) -> Any:
         gooey_options={
             "title": "Checksum",
             "show_border": True,
-            "initial_selection": 0 if os.getenv("DEFAULT_HASH") == "md5" else 1,
+            "initial_selection": default_value("hash", os.getenv("DEFAULT_HASH")),
         },
     )
     hash_chooser.add_argument(
@@ -203,12 +213,19 @@ def setup_parser(cli: GooeyParser) -> Any:
         help="Generate SHA256 checksum of downloaded files",
         gooey_options={"full_width": False},
     )
+    hash_chooser.add_argument(
+        "--blake2b",
+        dest="blake2b",
+        action="store_true",
+        help="Generate BLAKE2b checksum of downloaded files (only faster than SHA256 on CPUs without SHA-instructions)",
+        gooey_options={"full_width": False},
+    )
 
     args = cli.parse_args()
     return args
 
 
-def get_submission_info(uuid: str) -> Dict:
+def get_submission_info(client: "httpx.Client", submission_url: str, uuid: str) -> Dict:
     """Fetch and save submission-data
 
     Given a uuid and an out_dir, it tries to fetch the submission-data from
@@ -216,6 +233,8 @@ def get_submission_info(uuid: str) -> Dict:
     dict.
 
     Args:
+        client (httpx.Client): The shared client, with the api-key as default param.
+        submission_url (str): The submission-endpoint from the configuration.
         uuid (UUID): uuid of the submission. Copy from the mail-notification
         out_dir (Path): full path to the folder where the submission.json is
             to be saved. Usually the folder is named after the uuid.
@@ -228,26 +247,28 @@ def get_submission_info(uuid: str) -> Dict:
         HTTPException: All non-200 status_codes are raised
     """
 
-    with httpx.Client() as client:
-        print(f"Henter afleveringsformular med uuid: {uuid}", flush=True)
-        r = client.get(
-            f"{os.getenv('SUBMISSION_URL')}/{uuid}?api-key={os.getenv('API_KEY')}"
+    print(f"Henter afleveringsformular med uuid: {uuid}", flush=True)
+    r = client.get(f"{submission_url}/{uuid}")
+    if r.status_code == 404:
+        raise HTTPException(f"FEJl. Der findes ingen aflevering med dette uuid: {uuid}")
+    elif r.status_code in [401, 403]:
+        raise HTTPException(
+            f"FEJl. Adgang nægtet med den brugte API-nøgle til: {r.url}"
         )
-        if r.status_code == 404:
-            raise HTTPException(
-                f"FEJl. Der findes ingen aflevering med dette uuid: {uuid}"
-            )
-        elif r.status_code in [401, 403]:
-            raise HTTPException(
-                f"FEJl. Adgang nægtet med den brugte API-nøgle til: {r.url}"
-            )
-        elif r.status_code != 200:
-            raise HTTPException(
-                f"FEJl. Kunne ikke hente en aflevering med dette uuid: {uuid}. Status_code: {r.status_code}, fejlbesked: {r.text}"
-            )
+    elif r.status_code != 200:
+        raise HTTPException(
+            f"FEJl. Kunne ikke hente en aflevering med dette uuid: {uuid}. Status_code: {r.status_code}, fejlbesked: {r.text}"
+        )
+
+    # parse the raw bytes, skipping httpx' decoding of the body to text
+    submission: Dict = json.loads(r.content)
+    return submission
 
-        submission: Dict = r.json()
-        return submission
+
+def url_filename(url: str) -> str:
+    """Returns the unquoted last path-segment of url, without query or fragment"""
+    match = FILENAME_RE.search(url)
+    return urllib.parse.unquote(match.group(1), encoding="utf-8") if match else ""
 
 
 def extract_filelist(submission: Dict) -> List[Dict]:
@@ -257,28 +278,84 @@ def extract_filelist(submission: Dict) -> List[Dict]:
         raise ValueError("FEJL. Afleveringen indeholder ingen filer.")
 
     files: List[Dict] = []
-    for k, v in files_dict.items():
-        v["filename"] = urllib.parse.unquote(Path(v.get("url")).name, encoding="utf-8")  # type: ignore
-        files.append(v)
+    for v in files_dict.values():
+        filename = url_filename(v["url"])
+        # the filename becomes a path in the destination, it can't be empty or
+        # point anywhere else
+        if filename in ("", ".", "..") or any(
+            sep in filename for sep in ("/", os.sep, os.altsep) if sep
+        ):
+            log(
+                f"ADVARSEL. Fil-url'en har ikke et gyldigt filnavn, springer filen over: {v['url']}"
+            )
+            continue
+        files.append({**v, "filename": filename})
+    if not files:
+        raise ValueError("FEJL. Afleveringen indeholder ingen filer.")
     return files
 
 
-def generate_submission_info(submission: Dict, files: List[Dict]) -> Dict:
-    out: Dict = {}
-    prefix: str = os.getenv("ARCHIVE_PREFIX", "").lower()
-    for k, v in submission["data"].items():
-        if not v:
-            continue
-        if k.startswith(prefix):
-            out[k[4:]] = v
-        elif k in ADDITIONAL_FIELDS:
-            out[k] = v
-
+def generate_submission_info(submission: Dict, files: List[Dict], prefix: str) -> Dict:
+    # keys are named "{prefix}_{field}", strip both the prefix and the "_"
+    plen: int = len(prefix.rstrip("_")) + 1
+    out: Dict = {
+        (k[plen:] if k.startswith(prefix) else k): v
+        for k, v in submission["data"].items()
+        if v and (k.startswith(prefix) or k in ADDITIONAL_FIELDS)
+    }
     out["files"] = files
     # out["completed"] = submission.get("completed")
     return out
 
 
+@functools.lru_cache(maxsize=None)
+def xml_name(key: str) -> Tuple[str, Optional[str]]:
+    """Returns a valid xml-tag for a dict-key, and the key as name-attribute if it
+    can't be made into one. Uses the same rules as dicttoxml: numbers get an "n"
+    prefix, spaces become "_", and anything else becomes <key name="...">
+    """
+
+    def is_valid(name: str) -> bool:
+        # ElementTree doesn't check tag-names when serializing, so parse a test tag
+        try:
+            ET.fromstring(f"<{name}>foo</{name}>")
+        except ET.ParseError:
+            return False
+        return True
+
+    if is_valid(key):
+        return key, None
+    if key.isdigit():
+        return f"n{key}", None
+    try:
+        return f"n{float(key)}", None
+    except ValueError:
+        pass
+    if is_valid(key.replace(" ", "_")):
+        return key.replace(" ", "_"), None
+    return "key", key
+
+
+def build_xml(element: ET.Element, value: Any) -> None:
+    """Adds value to element as text or sub-elements. dicts become an element per
+    key, and every item in a list becomes a <file>-element
+    """
+    if isinstance(value, dict):
+        for k, v in value.items():
+            tag, name = xml_name(str(k))
+            sub = ET.SubElement(element, tag)
+            if name is not None:
+                sub.set("name", name)
+            build_xml(sub, v)
+    elif isinstance(value, list):
+        for item in value:
+            build_xml(ET.SubElement(element, "file"), item)
+    elif isinstance(value, bool):
+        element.text = str(value).lower()
+    elif value is not None:
+        element.text = str(value)
+
+
 def save_submission_info(submission: Dict, format: str, out_dir: Path) -> None:
     # Calculate filename
     if format == "arkibas":
@@ -295,91 +372,243 @@ def save_submission_info(submission: Dict, format: str, out_dir: Path) -> None:
         )
         return
 
-    with open(filepath, "w", encoding="utf-8") as f:
-        if format == "json":
-            json.dump(submission, f, ensure_ascii=False, indent=4)
-        elif format == "xml":
-            xml = dicttoxml.dicttoxml(
-                submission,
-                custom_root="submission",
-                attr_type=False,
-                item_func=lambda _: "file",
+    if format == "json":
+        # dumps() + one write is faster than dump(), which writes every chunk
+        data: str = json.dumps(submission, ensure_ascii=False, indent=4)
+        # as bytes, like the xml-file, so both keep \n line endings on windows too
+        filepath.write_bytes(data.encode("utf-8"))
+    elif format == "xml":
+        root = ET.Element("submission")
+        build_xml(root, submission)
+        ET.indent(root, space="\t")
+        # write() opens a path in text-mode, so serialize to utf-8 bytes first
+        filepath.write_bytes(ET.tostring(root, encoding="utf-8", xml_declaration=True))
+
+
+def download_file(
+    client: "httpx.Client",
+    file: Dict,
+    out_dir: str,
+    algoritm: str,
+    progress: str,
+    existing_size: Optional[int],
+) -> None:
+    """Download a single form-file to out_dir and add its checksum to the file-dict.
+    existing_size is the size of a file with the same name already in out_dir.
+    Called from download_files()"""
+    filename = file["filename"]
+    filepath = os.path.join(out_dir, filename)
+    if existing_size is not None:
+        # only trust an existing file, if it has the size given in the submission
+        size = file.get("size")
+        if size is None or existing_size == int(size):
+            log(f"ADVARSEL. Denne fil ligger allerede i afleveringsmappen: {filename}")
+            return
+        log(
+            f"ADVARSEL. Filen i afleveringsmappen er ufuldstændig, henter igen: {filename}"
+        )
+
+    log(f"{progress}: {filename} ({file.get('size')} bytes)...")
+    with client.stream("GET", file["url"]) as r:
+        if r.status_code == 404:
+            log(
+                f"FEJl. Afleveringen har ikke nogen vedhæftet fil med dette navn: {filename}"
             )
-            f.write(parseString(xml).toprettyxml())
+            # there is no file to hash in update_fileinfo()
+            file["missing"] = True
+            return
+        elif r.status_code in [401, 403]:
+            raise HTTPException(
+                f"FEJl. Adgang nægtet med den brugte API-nøgle til: {r.url}"
+            )
+        elif 500 <= r.status_code < 600:
+            raise HTTPException(
+                "FEJl. Serveren har problemer. Prøv igen senere eller anmeld fejlen til stadsarkiv@aarhus.dk"
+            )
+        elif r.status_code != 200:
+            r.read()
+            raise HTTPException(
+                f"FEJl. Der Kunne ikke hentes en fil på serveren med dette navn: {filename}. Status_code: {r.status_code} Server-respons: {r.text}"
+            )
+
+        # stream the body to disk, so large files aren't held in memory, and
+        # hash it on the way, so the file doesn't have to be read again
+        hash = hashlib.new(algoritm)
+        # the body goes to a .part-file, which only gets the real name when it is
+        # complete, so an interrupted download never passes the size-check above
+        partname = f"{filename}.part"
+        # most filesystems allow 255 bytes per name, a name that only fits without
+        # the suffix gets a .part-file with a fixed-length name instead
+        if len(os.fsencode(partname)) > 255:
+            partname = f"{hashlib.sha256(os.fsencode(filename)).hexdigest()}.part"
+        partpath = os.path.join(out_dir, partname)
+        # the chunks are already CHUNK_SIZE, so write them unbuffered to the fd.
+        # opened before the try, so the cleanup only removes a file it created
+        fd = os.open(partpath, WRITE_FLAGS, 0o644)
+        try:
+            try:
+                # reserve the expected size at once, so the file can be contiguous.
+                # only an optimisation, some filesystems don't support it
+                expected = int(file.get("size") or 0)
+                preallocated: bool = False
+                if expected > 0 and hasattr(os, "posix_fallocate"):
+                    with contextlib.suppress(OSError):
+                        os.posix_fallocate(fd, 0, expected)
+                        preallocated = True
+                written: int = 0
+                for chunk in r.iter_bytes(CHUNK_SIZE):
+                    hash.update(chunk)
+                    written += len(chunk)
+                    # os.write() may write less than the whole chunk
+                    view = memoryview(chunk)
+                    while view:
+                        view = view[os.write(fd, view) :]
+                # the body may be shorter than the submission says, cut off the rest
+                if preallocated and written != expected:
+                    os.ftruncate(fd, written)
+            finally:
+                # the file is never read again, so hint that its pages can go. they
+                # are still dirty here, so linux mostly just starts the writeback.
+                # only a best-effort hint, it must not hide an error or leak the fd
+                if hasattr(os, "posix_fadvise"):
+                    with contextlib.suppress(OSError):
+                        os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+                os.close(fd)
+
+            # if the server sends a Content-MD5 of the (unencoded) body, verify it
+            server_md5 = r.headers.get("Content-MD5")
+            if (
+                algoritm == "md5"
+                and server_md5
+                and "Content-Encoding" not in r.headers
+                and server_md5 != base64.b64encode(hash.digest()).decode()
+            ):
+                raise HTTPException(
+                    f"FEJl. Filen blev ikke hentet korrekt, checksummen passer ikke: {filename}"
+                )
+            os.replace(partpath, filepath)
+        except BaseException:
+            # don't leave a partial file behind
+            if os.path.exists(partpath):
+                os.remove(partpath)
+            raise
+
+        file["checksum"] = f"{algoritm}:{hash.hexdigest()}"
 
 
-def download_files(files: List[Dict], out_dir: Path) -> None:
+def download_files(
+    client: "httpx.Client", files: List[Dict], out_dir: Path, algoritm: str
+) -> None:
     """Download all form-files
 
     Given a submission-dict (returned from get_submission_info()) and an out_dir, it
     tries to download all files attached to the submitted form to the out_dir.
+    Up to MAX_DOWNLOADS files are downloaded concurrently over the shared client.
+    The checksum of each downloaded file is computed while it is being written.
+    Attachments with the same filename are downloaded once and share the checksum.
 
     Args:
+        client (httpx.Client): The shared client, with the api-key as default param.
         submission (dict): The submission-data returned by the API in a previous step.
         out_dir (Path): full path to the folder where the files are saved.
+        algoritm (str): The checksum algoritm, "md5", "sha256" or "blake2b".
 
     Raises:
         HTTPException: All non-200 status_codes are raised
     """
-    with httpx.Client() as client:
-        files_len: int = len(files)
-        print(f"Henter {files_len} fil(er):", flush=True)
-        for idx, d in enumerate(files, start=1):
-            filename = d["filename"]  # type: ignore
-            filepath = Path(out_dir, filename)
-            if filepath.exists():
-                print(
-                    f"ADVARSEL. Denne fil ligger allerede i afleveringsmappen: {filename}",
-                    flush=True,
-                )
-                continue
-
-            print(
-                f"{idx} af {files_len}: {filename} ({d.get('size')} bytes)...",
-                flush=True,
+    # attachments with the same name (ignoring case on windows) would be downloaded
+    # into the same file at once, so only the first of them is downloaded
+    unique: Dict[str, Dict] = {}
+    duplicates: List[Tuple[Dict, Dict]] = []
+    for d in files:
+        key = os.path.normcase(d["filename"])
+        if key in unique:
+            log(
+                f"ADVARSEL. Afleveringen har flere filer med dette navn, henter kun den første: {d['filename']}"
             )
-            r = client.get(d["url"], params={"api-key": os.getenv("API_KEY")})
-            if r.status_code == 404:
-                print(
-                    f"FEJl. Afleveringen har ikke nogen vedhæftet fil med dette navn: {filename}",
-                    flush=True,
-                )
-                continue
-            elif r.status_code in [401, 403]:
-                raise HTTPException(
-                    f"FEJl. Adgang nægtet med den brugte API-nøgle til: {r.url}"
-                )
-            elif str(r.status_code).startswith("5"):
-                raise HTTPException(
-                    "FEJl. Serveren har problemer. Prøv igen senere eller anmeld fejlen til stadsarkiv@aarhus.dk"
-                )
-            elif r.status_code != 200:
-                raise HTTPException(
-                    f"FEJl. Der Kunne ikke hentes en fil på serveren med dette navn: {filename}. Status_code: {r.status_code} Server-respons: {r.text}"
-                )
-
-            with open(filepath, "wb") as download:
-                download.write(r.content)
+            duplicates.append((d, unique[key]))
+        else:
+            unique[key] = d
+
+    files_len: int = len(unique)
+    print(f"Henter {files_len} fil(er):", flush=True)
+    base = os.fspath(out_dir)
+    # list out_dir once, and only stat the entries that are attachments. on windows
+    # the listing already has the sizes, so there is no stat per file at all.
+    # normcase matches names case-insensitively on windows, as the filesystem does
+    with os.scandir(base) as entries:
+        existing: Dict[str, int] = {
+            key: e.stat().st_size
+            for e in entries
+            if (key := os.path.normcase(e.name)) in unique and e.is_file()
+        }
+    with ThreadPoolExecutor(max_workers=min(MAX_DOWNLOADS, files_len)) as executor:
+        futures = [
+            executor.submit(
+                download_file,
+                client,
+                d,
+                base,
+                algoritm,
+                f"{idx} af {files_len}",
+                existing.get(key),
+            )
+            for idx, (key, d) in enumerate(unique.items(), start=1)
+        ]
+        try:
+            for future in futures:
+                future.result()
+        except Exception:
+            # don't start any more downloads, if one of them failed
+            executor.shutdown(wait=True, cancel_futures=True)
+            raise
+
+    # a duplicate is the same file on disk, so it gets the first one's checksum
+    for duplicate, first in duplicates:
+        for key in ("checksum", "missing"):
+            if key in first:
+                duplicate[key] = first[key]
 
 
 def update_fileinfo(files: List[Dict], out_dir: Path, algoritm: str) -> List[Dict]:
-    """Adds checksum to and removes unnecessary metadata from each file"""
-    IGNORE_KEYS = ["url", "id"]
-
-    def compute_hash(filepath: Path) -> str:
-        hash = hashlib.md5() if algoritm == "md5" else hashlib.sha256()
-        with open(filepath, "rb") as f:
-            for chunk in iter(lambda: f.read(4096), b""):
-                hash.update(chunk)
+    """Adds checksum to and removes unnecessary metadata from each file
+
+    Files downloaded in this run already have their checksum from download_files(),
+    and files the server didn't have are marked "missing" and get no checksum, so
+    only files that were already present in out_dir are read and hashed here.
+    """
+
+    def compute_hash(filepath: str) -> str:
+        # both paths read into their own buffer, so skip the BufferedReader copy
+        with open(filepath, "rb", buffering=0) as f:
+            # file_digest runs the read/update loop in C (python 3.11+)
+            if sys.version_info >= (3, 11):
+                # typeshed expects readinto() -> int, FileIO's may return None
+                return hashlib.file_digest(f, algoritm).hexdigest()  # type: ignore[arg-type]
+            hash = hashlib.new(algoritm)
+            buffer = bytearray(CHUNK_SIZE)
+            view = memoryview(buffer)
+            while n := f.readinto(buffer):
+                hash.update(view[:n])
         return hash.hexdigest()
 
-    out: List[Dict] = []
+    # hashlib releases the GIL while hashing, so files can be hashed in parallel
+    unhashed = [
+        file for file in files if "checksum" not in file and not file.get("missing")
+    ]
+    if unhashed:
+        workers = min(os.cpu_count() or 1, len(unhashed))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            base = os.fspath(out_dir)
+            paths = [os.path.join(base, file["filename"]) for file in unhashed]
+            for file, digest in zip(unhashed, executor.map(compute_hash, paths)):
+                file["checksum"] = f"{algoritm}:{digest}"
+
+    # the file-dicts are not used elsewhere, so strip them in place
     for file in files:
-        path = out_dir / file["filename"]
-        file["checksum"] = f"{algoritm}:{compute_hash(path)}"
-        new_file = {k: v for k, v in file.items() if k not in IGNORE_KEYS}
-        out.append(new_file)
-    return out
+        for key in IGNORE_KEYS:
+            file.pop(key, None)
+    return files
 
 
 @Gooey(
@@ -403,61 +632,74 @@ def main() -> None:
     except ValueError:
         sys.exit("Konfigurationsfilen kan ikke parses")
 
+    # read the configuration once, instead of in every function that needs it
+    api_key: str = os.environ["API_KEY"]
+    submission_url: str = os.environ["SUBMISSION_URL"]
+    archive_prefix: str = os.environ["ARCHIVE_PREFIX"].lower()
+
     # Setup parser
     cli: GooeyParser = GooeyParser(description="Smartarkivering")
     args = setup_parser(cli)
 
     # Validate arguments
     try:
-        uuid.UUID(args.uuid)
+        # the canonical form, e.g. without braces or uppercase hex-digits
+        submission_id: str = str(uuid.UUID(args.uuid))
     except ValueError:
         sys.exit("FEJL. Det indtastede uuid har ikke det korrekte format.")
 
     if not Path(args.destination).is_dir():
         sys.exit("FEJL. Destinationen skal være en eksisterende mappe.")
 
-    out_dir = Path(args.destination, args.uuid)
+    out_dir = Path(args.destination, submission_id)
     try:
         out_dir.mkdir(parents=True, exist_ok=True)
     except Exception as e:
         sys.exit(f"FEJl. Kan ikke oprette destinationsmappen: {e}")
 
-    # Fetch submission info
-    try:
-        # get_submission_info prints any errors with http or json-parsing
-        submission: Dict = get_submission_info(args.uuid)
-    except HTTPException as e:
-        sys.exit(e.args[0])
-
-    # extract info on uploaded files
-    try:
-        fileinfo: List[Dict] = extract_filelist(submission)
-    except ValueError:
-        sys.exit("FEJL. Afleveringen indeholder ingen filreferencer")
-
-    # download attached files
-    try:
-        download_files(fileinfo, out_dir)
-    except Exception as e:
-        sys.exit(e.args[0])
+    # httpx is slow to import, so only the process that downloads imports it
+    import httpx
+
+    # one client for the submission and all files, so the connection is reused
+    with httpx.Client(
+        params={"api-key": api_key},
+        # give a slow server more time than httpx' default of 5 seconds
+        timeout=httpx.Timeout(30.0, connect=10.0),
+    ) as client:
+        # Fetch submission info
+        try:
+            # get_submission_info prints any errors with http or json-parsing
+            submission: Dict = get_submission_info(
+                client, submission_url, submission_id
+            )
+        except HTTPException as e:
+            sys.exit(e.args[0])
+
+        # extract info on uploaded files
+        try:
+            fileinfo: List[Dict] = extract_filelist(submission)
+        except ValueError:
+            sys.exit("FEJL. Afleveringen indeholder ingen filreferencer")
+
+        # download attached files
+        hash: Optional[str] = next((h for h in HASHES if getattr(args, h)), None)
+        if hash is None:
+            sys.exit("FEJL. Der er ikke valgt en gyldig checksum")
+        try:
+            download_files(client, fileinfo, out_dir, hash)
+        except Exception as e:
+            sys.exit(e.args[0])
 
     # update fileinfo
-    hash = "md5" if args.md5 else "sha256"
     updated_fileinfo = update_fileinfo(fileinfo, out_dir, hash)
 
     # put together new submission-data
-    submission = generate_submission_info(submission, updated_fileinfo)
+    submission = generate_submission_info(submission, updated_fileinfo, archive_prefix)
 
     # save submission to requested format
-    fmt: str = ""
-    if args.json:
-        fmt = "json"
-    elif args.xml:
-        fmt = "xml"
-    elif args.arkibas:
-        fmt = "arkibas"
-    else:
-        sys.exit(f"FEJL. {fmt} er ikke et valid format")
+    fmt: Optional[str] = next((f for f in FORMATS if getattr(args, f)), None)
+    if fmt is None:
+        sys.exit("FEJL. Der er ikke valgt et gyldigt format")
 
     # save submission data to file
     save_submission_info(submission, format=fmt, out_dir=out_dir)